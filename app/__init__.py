@@ -0,0 +1,32 @@
+from flask import Flask
+from flask_compress import Compress
+from flask_cors import CORS  # Import CORS
+
+from .onboarding import onboarding_bp
+from .scoring import scoring_bp
+
+# --- 4. FLASK API SERVER (Now "crash-proof") ---
+# [ --- MODIFIED --- ] The routes live in blueprints (onboarding.py, scoring.py).
+# Run with `gunicorn app:app`.
+
+def home():
+    """A simple route to check if the server is running."""
+    return "GlucoFlow AI Engine is running."
+
+def create_app():
+    """Creates the Flask app and registers the blueprints."""
+    app = Flask(__name__)
+    CORS(app)  # Initialize CORS for the entire app. This allows all origins
+
+    # [ NEW ] Compress responses for clients that accept it (Brotli first, gzip otherwise).
+    # Tiny bodies like error messages aren't worth it, so only compress above ~200 bytes.
+    app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+    app.config['COMPRESS_MIN_SIZE'] = 200
+    Compress(app)
+
+    app.register_blueprint(onboarding_bp)
+    app.register_blueprint(scoring_bp)
+    app.add_url_rule('/', view_func=home)
+    return app
+
+app = create_app()
@@ -0,0 +1,62 @@
+import msgspec
+import orjson
+from flask import current_app, request
+
+from .models import (
+    ACTIVITY_CODES, SLEEP_QUALITY_CODES, STRESS_CODES, NormLog, encode_category,
+)
+
+# --- [ NEW ] Fast JSON responses ---
+# orjson encodes our small response dicts much faster than Flask's jsonify.
+
+def fastjson(payload, status=200):
+    """Returns `payload` (a dict, or bytes that are already JSON) as a JSON response."""
+    body = payload if isinstance(payload, bytes) else orjson.dumps(payload)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+# --- [ NEW ] Fast request decoding ---
+# msgspec decodes and type-checks a well-formed JSON body in a single C call.
+# Bodies it rejects (numbers sent as strings, nulls, ...) are still accepted:
+# the routes fall back to the forgiving safe_* conversions for those.
+
+class LogFields(msgspec.Struct):
+    """The fields of one log in a request. Defaults match what safe_* gives for a missing field."""
+    sleep_hours: float = 0.0
+    sleep_quality: str = ""
+    carbs_g: int = 0
+    protein_g: int = 0
+    fat_g: int = 0
+    activity_minutes: int = 0
+    activity_type: str = ""
+    stress_level: str = ""
+    took_metformin: bool = False
+    took_insulin: bool = False
+
+    def to_log(self):
+        """Returns the log fields as a NormLog (no safe_* conversion needed)."""
+        return NormLog(
+            sleep_hours=self.sleep_hours,
+            sleep_quality=encode_category(self.sleep_quality, SLEEP_QUALITY_CODES),
+            carbs_g=self.carbs_g,
+            protein_g=self.protein_g,
+            fat_g=self.fat_g,
+            activity_minutes=self.activity_minutes,
+            activity_type=encode_category(self.activity_type, ACTIVITY_CODES),
+            stress_level=encode_category(self.stress_level, STRESS_CODES),
+            took_metformin=self.took_metformin,
+            took_insulin=self.took_insulin,
+        )
+
+def decode_body(decoder):
+    """Decodes the current JSON request body with `decoder`, or returns None if it doesn't fit."""
+    if not request.is_json:
+        return None
+    try:
+        return decoder.decode(request.get_data())
+    except msgspec.MsgspecError:
+        return None
+
+# Error bodies that never change are encoded once, up front
+ERR_USER_NAME_REQUIRED = orjson.dumps({"error": "Missing field: user_name is required"})
+ERR_USER_NOT_FOUND = orjson.dumps({"error": "User not found. Please onboard first."})
+ERR_INTERNAL = orjson.dumps({"error": "An internal server error occurred."})
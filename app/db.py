@@ -0,0 +1,33 @@
+import threading
+
+from .models import UserProfile
+
+# --- [ MODIFIED ] Our simple, in-memory database, now split into shards ---
+# Each shard is a plain dict with its own lock, so requests for different users
+# (almost always) land on different locks instead of all contending on one.
+
+N_SHARDS = 16  # Must be a power of two (see _shard_index)
+USER_SHARDS = [{} for _ in range(N_SHARDS)]
+SHARD_LOCKS = [threading.Lock() for _ in range(N_SHARDS)]
+
+def _shard_index(user_name):
+    # Python caches a string's hash on the string itself, so picking the shard here
+    # is the only time a request's user_name gets hashed: the dict lookup in the
+    # shard (and any later shard_lock call) reuses it.
+    return hash(user_name) & (N_SHARDS - 1)
+
+def shard_lock(user_name):
+    """Returns the lock guarding this user (hold it while changing their data)."""
+    return SHARD_LOCKS[_shard_index(user_name)]
+
+def get_user(user_name):
+    """Returns the UserProfile for `user_name`, or None if they haven't onboarded."""
+    i = _shard_index(user_name)
+    with SHARD_LOCKS[i]:
+        return USER_SHARDS[i].get(user_name)
+
+def save_user(user: UserProfile):
+    """Adds (or replaces) a user in the database."""
+    i = _shard_index(user.name)
+    with SHARD_LOCKS[i]:
+        USER_SHARDS[i][user.name] = user
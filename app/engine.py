@@ -0,0 +1,86 @@
+import numpy as np
+
+from .logstore import LogStore
+from .models import ACTIVITY_AEROBIC, ACTIVITY_ANAEROBIC, STRESS_HIGH, DailyLog, UserProfile
+from .rules import EXPL_TABLE, RULE
+
+# --- [ NEW ] BATCH PREDICTION ENGINE ---
+# Only /add_logs uses this module: the scoring blueprint loads it on a worker's
+# first /add_logs request (see scoring._lazy_import).
+
+# The engine as a linear model: one weight per rule, in RiskFlag bit order,
+# so column k of a feature matrix lines up with RULE_WEIGHTS[k] and RULE_BITS[k].
+RULE_WEIGHTS = np.array([impact for _, impact in EXPL_TABLE.values()], dtype=np.float64)
+RULE_BITS = np.array(list(EXPL_TABLE), dtype=np.int64)
+
+# The last two rules (BMI and duration amplifiers) depend on the score so far
+_N_BASE_RULES = len(EXPL_TABLE) - 2
+
+def predict_batch(user: UserProfile, logs):
+    """
+    Vectorized version of the rule engine (see rules._scorer_for) for many logs at
+    once (e.g. re-scoring a user's whole history for a dashboard).
+    [ --- MODIFIED --- ] Written as a linear model: every rule is a 0/1 column of a
+    `features` matrix (one row per log), and the score is `features` weighted by
+    RULE_WEIGHTS, then the two amplifiers are applied on top.
+
+    `logs` can be a list of DailyLog/NormLog objects, a user's LogStore, or columns
+    in the DailyLog.to_arrays format.
+    Returns (risk_scores, flags): two arrays with one entry per log, where `flags`
+    holds the RiskFlag bits of each log (see explanation_from_flags).
+    """
+    if isinstance(logs, LogStore):
+        cols = logs.columns()
+    elif isinstance(logs, dict):
+        cols = logs
+    else:
+        cols = DailyLog.to_arrays(logs)
+    carbs = cols['carbs_g']
+    activity = cols['activity_minutes']
+    activity_type = cols['activity_type']
+
+    # --- 1. Build the feature matrix (one column per rule) ---
+    features = np.zeros((len(carbs), len(EXPL_TABLE)), dtype=np.bool_)
+
+    # Dietary Factors
+    high_carb = carbs > RULE.CARB_THRESHOLD
+    features[:, 0] = high_carb
+    features[:, 1] = high_carb & ((cols['protein_g'] > RULE.BALANCED_PROTEIN_THRESHOLD)
+                                  | (cols['fat_g'] > RULE.BALANCED_FAT_THRESHOLD))
+
+    # Lifestyle Factors
+    features[:, 2] = cols['sleep_hours'] < RULE.SLEEP_THRESHOLD
+    features[:, 3] = cols['stress_level'] == STRESS_HIGH
+
+    # The three activity rules are mutually exclusive (if / elif / elif)
+    low_activity = activity < RULE.ACTIVITY_THRESHOLD
+    post_meal_aerobic = (~low_activity & (activity_type == ACTIVITY_AEROBIC)
+                         & (carbs > RULE.POST_MEAL_CARB_THRESHOLD))
+    features[:, 4] = low_activity
+    features[:, 5] = post_meal_aerobic
+    features[:, 6] = ~low_activity & ~post_meal_aerobic & (activity_type == ACTIVITY_ANAEROBIC)
+
+    # Personalized Clinical Factors
+    features[:, 7] = user.on_metformin & ~cols['took_metformin']
+    features[:, 8] = user.on_insulin & ~cols['took_insulin']
+
+    # --- 2. Weight the features ---
+    # NOTE: this is `features @ RULE_WEIGHTS`, but summed one column at a time in
+    # rule order. BLAS reorders the additions, which changes the last bit of some
+    # scores and can push a score across a threshold (e.g. 0.6 vs 0.6000000000000001).
+    # Summing in order matches the per-profile scorers exactly.
+    risk = np.zeros(len(carbs))
+    for k in range(_N_BASE_RULES):
+        risk += features[:, k] * RULE_WEIGHTS[k]
+
+    # --- 3. Compounding Factors ---
+    features[:, 9] = (user.bmi > RULE.BMI_THRESHOLD) & (risk > 0)
+    risk += features[:, 9] * RULE_WEIGHTS[9]
+    features[:, 10] = (user.years_since_diagnosis > RULE.DURATION_THRESHOLD) & (risk > 0)
+    risk += features[:, 10] * RULE_WEIGHTS[10]
+
+    # --- 4. Finalize the Scores ---
+    # Integer matmul is exact, so the flags can use the real product
+    flags = features @ RULE_BITS
+    return np.clip(risk, 0.0, 1.0), flags
+
@@ -0,0 +1,143 @@
+from collections import namedtuple
+import numpy as np
+
+from .models import normalize_log
+
+# --- [ NEW ] COLUMNAR LOG STORAGE ---
+
+# A lightweight, read-only row of a LogStore. It has the same fields as DailyLog,
+# so the prediction and feedback engines can use either one.
+LogView = namedtuple('LogView', [
+    'date', 'sleep_hours', 'sleep_quality', 'carbs_g', 'protein_g', 'fat_g',
+    'activity_minutes', 'activity_type', 'stress_level',
+    'took_metformin', 'took_insulin',
+])
+
+class LogStore:
+    """
+    Holds all of a user's daily logs as parallel NumPy arrays (one array per field)
+    instead of a list of DailyLog objects. Walking a user's history then reads a few
+    contiguous arrays rather than chasing one Python object per day.
+    The two medication booleans are packed into a single uint8 bitfield.
+    """
+    TOOK_METFORMIN = 1  # bit 0 of `flags`
+    TOOK_INSULIN = 2    # bit 1 of `flags`
+
+    _COLUMNS = ('dates', 'sleep_hours', 'sleep_quality', 'carbs_g', 'protein_g', 'fat_g',
+                'activity_minutes', 'activity_type', 'stress_level', 'flags')
+
+    def __init__(self, cap=64):
+        self.n = 0
+        self.dates = np.empty(cap, dtype='datetime64[D]')
+        self.sleep_hours = np.empty(cap, dtype=np.float64)
+        self.sleep_quality = np.empty(cap, dtype=np.uint8)
+        self.carbs_g = np.empty(cap, dtype=np.int32)
+        self.protein_g = np.empty(cap, dtype=np.int32)
+        self.fat_g = np.empty(cap, dtype=np.int32)
+        self.activity_minutes = np.empty(cap, dtype=np.int32)
+        self.activity_type = np.empty(cap, dtype=np.uint8)
+        self.stress_level = np.empty(cap, dtype=np.uint8)
+        self.flags = np.empty(cap, dtype=np.uint8)
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return f"<LogStore: {self.n} logs>"
+
+    def _grow(self):
+        """Doubles the capacity of every column (amortized O(1) appends, like a list)."""
+        cap = 2 * len(self.flags)
+        for name in self._COLUMNS:
+            setattr(self, name, np.resize(getattr(self, name), cap))
+
+    def append(self, date, sleep_hours, sleep_quality, carbs_g, protein_g, fat_g,
+               activity_minutes, activity_type, stress_level,
+               took_metformin, took_insulin):
+        """
+        Adds one day of raw inputs (same arguments as DailyLog) and returns its row index.
+        Inputs go through the same "safe" conversions as DailyLog (see normalize_log).
+        """
+        return self.append_normalized(date, normalize_log(
+            sleep_hours, sleep_quality, carbs_g, protein_g, fat_g,
+            activity_minutes, activity_type, stress_level,
+            took_metformin, took_insulin))
+
+    def append_normalized(self, date, log):
+        """Adds one day that is already converted (a NormLog) and returns its row index."""
+        if self.n == len(self.flags):
+            self._grow()
+        i = self.n
+
+        self.dates[i] = date
+        self.sleep_hours[i] = log.sleep_hours
+        self.sleep_quality[i] = log.sleep_quality
+        self.carbs_g[i] = log.carbs_g
+        self.protein_g[i] = log.protein_g
+        self.fat_g[i] = log.fat_g
+        self.activity_minutes[i] = log.activity_minutes
+        self.activity_type[i] = log.activity_type
+        self.stress_level[i] = log.stress_level
+        self.flags[i] = (log.took_metformin * self.TOOK_METFORMIN
+                         | log.took_insulin * self.TOOK_INSULIN)
+
+        self.n += 1
+        return i
+
+    def append_many(self, date, cols):
+        """
+        Adds many days at once, given as columns in the DailyLog.to_arrays format
+        (all dated `date`). Returns the row index of the first new day.
+        """
+        k = len(cols['carbs_g'])
+        while self.n + k > len(self.flags):
+            self._grow()
+        start, end = self.n, self.n + k
+
+        # One slice copy per column (instead of k single-row appends)
+        self.dates[start:end] = date
+        for name in ('sleep_hours', 'sleep_quality', 'carbs_g', 'protein_g', 'fat_g',
+                     'activity_minutes', 'activity_type', 'stress_level'):
+            getattr(self, name)[start:end] = cols[name]
+        self.flags[start:end] = (cols['took_metformin'] * self.TOOK_METFORMIN
+                                 | cols['took_insulin'] * self.TOOK_INSULIN)
+
+        self.n = end
+        return start
+
+    def view(self, i):
+        """Returns row `i` as a LogView of plain Python values."""
+        flags = int(self.flags[i])
+        return LogView(
+            date=self.dates[i].item(),
+            sleep_hours=float(self.sleep_hours[i]),
+            sleep_quality=int(self.sleep_quality[i]),
+            carbs_g=int(self.carbs_g[i]),
+            protein_g=int(self.protein_g[i]),
+            fat_g=int(self.fat_g[i]),
+            activity_minutes=int(self.activity_minutes[i]),
+            activity_type=int(self.activity_type[i]),
+            stress_level=int(self.stress_level[i]),
+            took_metformin=bool(flags & self.TOOK_METFORMIN),
+            took_insulin=bool(flags & self.TOOK_INSULIN),
+        )
+
+    def columns(self):
+        """
+        Returns the filled part of every column, in the same format as
+        DailyLog.to_arrays (the arrays are views, not copies).
+        """
+        n = self.n
+        flags = self.flags[:n]
+        return {
+            'carbs_g': self.carbs_g[:n],
+            'protein_g': self.protein_g[:n],
+            'fat_g': self.fat_g[:n],
+            'activity_minutes': self.activity_minutes[:n],
+            'sleep_hours': self.sleep_hours[:n],
+            'took_metformin': (flags & self.TOOK_METFORMIN) != 0,
+            'took_insulin': (flags & self.TOOK_INSULIN) != 0,
+            'sleep_quality': self.sleep_quality[:n],
+            'activity_type': self.activity_type[:n],
+            'stress_level': self.stress_level[:n],
+        }
@@ -0,0 +1,207 @@
+import functools
+import sys
+from collections import namedtuple
+
+# --- [ NEW ] Helper functions to make our app "crash-proof" ---
+# These will safely convert inputs, even if the frontend sends empty strings.
+
+def safe_int(value, default=0):
+    """Safely converts a value to an integer."""
+    if type(value) is int:  # Fast path: already an int (the common case)
+        return value
+    try:
+        # Try to convert a float string (e..g, "5.0") to int first
+        return int(float(value))
+    except (ValueError, TypeError, OverflowError):  # OverflowError: "inf"
+        return default
+
+def safe_float(value, default=0.0):
+    """Safely converts a value to a float."""
+    if type(value) is float:  # Fast path: already a float
+        return value
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+_TRUTHY = frozenset(('true', 't', '1', 'yes', 'y'))
+
+def safe_bool(value):
+    """Safely converts a value to a boolean."""
+    # Fast paths: JSON booleans and numbers don't need a string round-trip
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    if isinstance(value, (int, float)):
+        return bool(value)
+    # Handles "true", "True", "t", "1", "yes", "y"
+    return value.lower() in _TRUTHY if isinstance(value, str) else False
+
+# --- [ NEW ] Category codes ---
+# The text fields of a log are stored as small ints instead of strings.
+# Matching is case-insensitive, and unknown values get code 0.
+
+SLEEP_QUALITY_CODES = {"poor": 0, "fair": 1, "good": 2, "excellent": 3}
+ACTIVITY_CODES = {"none": 0, "aerobic": 1, "anaerobic": 2}
+STRESS_CODES = {"low": 0, "medium": 1, "high": 2}
+
+# The codes the rules check for
+ACTIVITY_AEROBIC = ACTIVITY_CODES["aerobic"]
+ACTIVITY_ANAEROBIC = ACTIVITY_CODES["anaerobic"]
+STRESS_HIGH = STRESS_CODES["high"]
+
+def encode_category(value, codes):
+    """Converts a text value (e.g. "High") to its code in `codes`."""
+    return codes.get(str(value).lower(), 0)
+
+# --- [ NEW ] Cached input normalization ---
+# Clients often send the same log values again (e.g. a "what-if" slider), so the
+# safe_* conversions of a log's raw inputs are cached. The date is not part of it.
+# Only small scalar inputs are cached: a key holds on to the raw values, and a
+# client sending e.g. a 1 MB string shouldn't be able to park it in the cache.
+
+NormLog = namedtuple('NormLog', [
+    'sleep_hours', 'sleep_quality', 'carbs_g', 'protein_g', 'fat_g',
+    'activity_minutes', 'activity_type', 'stress_level',
+    'took_metformin', 'took_insulin',
+])
+
+# typed=True keeps e.g. 1, 1.0 and True apart, since str() turns them into different strings
+@functools.lru_cache(maxsize=4096, typed=True)
+def _normalize(sleep_hours, sleep_quality, carbs_g, protein_g, fat_g,
+               activity_minutes, activity_type, stress_level,
+               took_metformin, took_insulin):
+    return NormLog(
+        sleep_hours=safe_float(sleep_hours, 0),
+        sleep_quality=encode_category(sleep_quality, SLEEP_QUALITY_CODES),
+        carbs_g=safe_int(carbs_g, 0),
+        protein_g=safe_int(protein_g, 0),
+        fat_g=safe_int(fat_g, 0),
+        activity_minutes=safe_int(activity_minutes, 0),
+        activity_type=encode_category(activity_type, ACTIVITY_CODES),
+        stress_level=encode_category(stress_level, STRESS_CODES),
+        took_metformin=safe_bool(took_metformin),
+        took_insulin=safe_bool(took_insulin),
+    )
+
+_CACHEABLE_TYPES = frozenset((bool, int, float, type(None)))
+_MAX_CACHED_STR = 32  # Longer than any valid field value
+
+def normalize_log(*raw_fields):
+    """Safely converts a log's raw inputs (in NormLog field order) into a NormLog."""
+    for value in raw_fields:
+        if type(value) not in _CACHEABLE_TYPES and not (
+                type(value) is str and len(value) <= _MAX_CACHED_STR):
+            # Long string, list, dict, ...: convert it without the cache
+            return _normalize.__wrapped__(*raw_fields)
+    return _normalize(*raw_fields)
+
+# --- [ NEW ] Amount limits ---
+# Grams and minutes are saved in int32 columns (see LogStore), so the routes reject
+# a log with a larger value (400) instead of failing when it is saved.
+AMOUNT_MIN = -2**31
+AMOUNT_MAX = 2**31 - 1
+
+def amounts_in_range(log):
+    """True if the grams and minutes of `log` (a NormLog) fit in the log columns."""
+    return all(AMOUNT_MIN <= value <= AMOUNT_MAX
+               for value in (log.carbs_g, log.protein_g, log.fat_g, log.activity_minutes))
+
+# --- 1. DATA STRUCTURES (Now with "safe" inputs) ---
+
+class UserProfile:
+    """
+    Holds the static, long-term data for a single user.
+    """
+    # [ NEW ] Fixed attribute layout: smaller instances and faster attribute access
+    __slots__ = ('name', 'age', 'diagnosis_type', 'years_since_diagnosis', 'bmi',
+                 'on_metformin', 'on_insulin', '_store')
+
+    def __init__(self, name, age, diagnosis_type, years_since_diagnosis, bmi, on_metformin, on_insulin):
+        # Demographics
+        # [ --- MODIFIED --- ] Interned: the name is also this user's database key
+        self.name = sys.intern(str(name))
+        # [ --- MODIFIED --- ] Use safe conversion
+        self.age = safe_int(age, 30) 
+        
+        # Clinical Profile
+        self.diagnosis_type = str(diagnosis_type)
+        self.years_since_diagnosis = safe_int(years_since_diagnosis, 0)
+        self.bmi = safe_float(bmi, 25.0)
+        
+        # Medications
+        self.on_metformin = safe_bool(on_metformin)
+        self.on_insulin = safe_bool(on_insulin)
+        
+        # [ --- MODIFIED --- ] Logs are kept column-by-column (see LogStore).
+        # The store is created on first use, so onboarding a user doesn't load NumPy.
+        self._store = None
+
+    @property
+    def store(self):
+        """This user's logs (a LogStore)."""
+        if self._store is None:
+            from .logstore import LogStore
+            self._store = LogStore()
+        return self._store
+
+    def __repr__(self):
+        return f"<UserProfile: {self.name}, {self.age}, {self.diagnosis_type}>"
+
+class DailyLog:
+    """
+    Holds the dynamic, daily inputs from the user.
+    [ --- UPGRADED --- ] Now includes stress and activity type.
+    """
+    # [ NEW ] Fixed attribute layout: smaller instances and faster attribute access
+    __slots__ = ('date', 'sleep_hours', 'sleep_quality', 'carbs_g', 'protein_g', 'fat_g',
+                 'activity_minutes', 'activity_type', 'stress_level',
+                 'took_metformin', 'took_insulin')
+
+    def __init__(self, date, sleep_hours, sleep_quality, carbs_g, protein_g, fat_g, 
+                 activity_minutes, activity_type, stress_level, # <-- NEW FIELDS
+                 took_metformin, took_insulin):
+        self.date = date
+        
+        # [ --- MODIFIED --- ] Use safe conversion for all inputs
+        self.sleep_hours = safe_float(sleep_hours, 0)
+        self.sleep_quality = encode_category(sleep_quality, SLEEP_QUALITY_CODES)
+        self.carbs_g = safe_int(carbs_g, 0)
+        self.protein_g = safe_int(protein_g, 0)
+        self.fat_g = safe_int(fat_g, 0)
+        
+        # [ --- MODIFIED --- ] New activity and stress fields
+        self.activity_minutes = safe_int(activity_minutes, 0)
+        # [ --- MODIFIED --- ] Stored as category codes (see ACTIVITY_CODES / STRESS_CODES)
+        self.activity_type = encode_category(activity_type, ACTIVITY_CODES) # "none", "aerobic", "anaerobic"
+        self.stress_level = encode_category(stress_level, STRESS_CODES) # "low", "medium", "high"
+        
+        # Medication Adherence
+        self.took_metformin = safe_bool(took_metformin)
+        self.took_insulin = safe_bool(took_insulin)
+
+    def __repr__(self):
+        return f"<DailyLog: {self.date.strftime('%Y-%m-%d')}, Carbs: {self.carbs_g}g>"
+
+    @classmethod
+    def to_arrays(cls, logs):
+        """
+        [ NEW ] Turns a list of logs into one NumPy column per field, so a whole
+        history can be scored in a single vectorized pass (see predict_batch).
+        """
+        import numpy as np  # Only needed once logs are scored (see scoring._lazy_import)
+
+        return {
+            'carbs_g': np.asarray([log.carbs_g for log in logs], dtype=np.int32),
+            'protein_g': np.asarray([log.protein_g for log in logs], dtype=np.int32),
+            'fat_g': np.asarray([log.fat_g for log in logs], dtype=np.int32),
+            'activity_minutes': np.asarray([log.activity_minutes for log in logs], dtype=np.int32),
+            'sleep_hours': np.asarray([log.sleep_hours for log in logs], dtype=np.float64),
+            'took_metformin': np.asarray([log.took_metformin for log in logs], dtype=np.bool_),
+            'took_insulin': np.asarray([log.took_insulin for log in logs], dtype=np.bool_),
+            'sleep_quality': np.asarray([log.sleep_quality for log in logs], dtype=np.uint8),
+            'activity_type': np.asarray([log.activity_type for log in logs], dtype=np.uint8),
+            'stress_level': np.asarray([log.stress_level for log in logs], dtype=np.uint8),
+        }
+
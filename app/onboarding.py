@@ -0,0 +1,42 @@
+import orjson
+from flask import Blueprint, request
+
+from .api import ERR_INTERNAL, fastjson
+from .db import save_user
+from .models import UserProfile
+
+onboarding_bp = Blueprint('onboarding', __name__)
+
+_ERR_NAME_REQUIRED = orjson.dumps({"error": "Missing field: name is required"})
+
+@onboarding_bp.route('/onboard', methods=['POST'])
+def onboard_user():
+    """
+    Endpoint to create a new user profile.
+    [ --- MODIFIED --- ] Now more robust to bad/missing data.
+    """
+    data = request.json
+
+    try:
+        # Check for minimum required field
+        if 'name' not in data or not data['name']:
+            return fastjson(_ERR_NAME_REQUIRED, 400)
+
+        user = UserProfile(
+            name=data.get('name'),
+            age=data.get('age'),
+            diagnosis_type=data.get('diagnosis_type'),
+            years_since_diagnosis=data.get('years_since_diagnosis'),
+            bmi=data.get('bmi'),
+            on_metformin=data.get('on_metformin'),
+            on_insulin=data.get('on_insulin')
+        )
+
+        save_user(user)
+        return fastjson({"message": f"User {user.name} created successfully!"}, 201)
+
+    except Exception as e:
+        # Log the full error on the server for debugging
+        print(f"Error in /onboard: {str(e)}")
+        # Return a generic error to the user
+        return fastjson(ERR_INTERNAL, 500)
@@ -0,0 +1,406 @@
+import functools
+import sys
+from collections import namedtuple
+from enum import IntFlag
+from types import SimpleNamespace
+
+from .models import ACTIVITY_AEROBIC, ACTIVITY_ANAEROBIC, STRESS_HIGH, DailyLog, UserProfile
+
+# --- 2. AI PREDICTION ENGINE (The "Smarter" Brain) ---
+# The rules themselves. The vectorized engine built on them (predict_batch) is in engine.py.
+
+# [ NEW ] The thresholds and weights of the rules. This is their only copy: the
+# explanations, the per-profile scorers and predict_batch are all built from it.
+RULE = SimpleNamespace(
+    CARB_THRESHOLD=80,              # g
+    CARB_RISK=0.40,
+    BALANCED_PROTEIN_THRESHOLD=15,  # g
+    BALANCED_FAT_THRESHOLD=10,      # g
+    BALANCED_MEAL_OFFSET=-0.10,
+    SLEEP_THRESHOLD=6,              # hours
+    SLEEP_RISK=0.15,
+    STRESS_RISK=0.20,
+    ACTIVITY_THRESHOLD=10,          # minutes
+    LOW_ACTIVITY_RISK=0.15,
+    POST_MEAL_CARB_THRESHOLD=50,    # g
+    POST_MEAL_AEROBIC_OFFSET=-0.20,
+    ANAEROBIC_OFFSET=-0.10,
+    METFORMIN_RISK=0.30,
+    INSULIN_RISK=0.50,
+    BMI_THRESHOLD=28,
+    BMI_AMPLIFIER=0.10,
+    DURATION_THRESHOLD=5,           # years
+    DURATION_AMPLIFIER=0.10,
+)
+
+# [ NEW ] Explanation names shown to the user. They are interned, so every
+# explanation dict we build shares the same key objects.
+EXPL = SimpleNamespace(
+    HIGH_CARB=sys.intern("High-Carb Meal ( > 80g)"),
+    BALANCED_MEAL=sys.intern("Balanced Meal Offset"),
+    POOR_SLEEP=sys.intern("Poor Sleep ( < 6 hours)"),
+    HIGH_STRESS=sys.intern("High Stress Level"),
+    LOW_ACTIVITY=sys.intern("Low Activity ( < 10 min)"),
+    POST_MEAL_AEROBIC=sys.intern("Post-Meal Aerobic Activity"),
+    ANAEROBIC=sys.intern("Anaerobic Activity"),
+    MISSED_METFORMIN=sys.intern("Missed Metformin Dose"),
+    MISSED_INSULIN=sys.intern("Missed Insulin Dose"),
+    BMI_AMPLIFIER=sys.intern("Risk amplified by BMI"),
+    DURATION_AMPLIFIER=sys.intern("Risk amplified by T2D duration"),
+)
+
+# [ NEW ] One bit per rule. The engines return these bits (a single int) instead of
+# building an explanation dict; the dict is only made when a response is sent.
+class RiskFlag(IntFlag):
+    HIGH_CARB = 1 << 0
+    BALANCED_MEAL = 1 << 1
+    POOR_SLEEP = 1 << 2
+    HIGH_STRESS = 1 << 3
+    LOW_ACTIVITY = 1 << 4
+    POST_MEAL_AEROBIC = 1 << 5
+    ANAEROBIC = 1 << 6
+    MISSED_METFORMIN = 1 << 7
+    MISSED_INSULIN = 1 << 8
+    BMI_AMPLIFIER = 1 << 9
+    DURATION_AMPLIFIER = 1 << 10
+
+# Plain-int copies of the flags for the hot paths: `int & RiskFlag.X` goes through the
+# enum machinery (~25x slower than `int & int`).
+F_HIGH_CARB = int(RiskFlag.HIGH_CARB)
+F_BALANCED_MEAL = int(RiskFlag.BALANCED_MEAL)
+F_POOR_SLEEP = int(RiskFlag.POOR_SLEEP)
+F_HIGH_STRESS = int(RiskFlag.HIGH_STRESS)
+F_LOW_ACTIVITY = int(RiskFlag.LOW_ACTIVITY)
+F_POST_MEAL_AEROBIC = int(RiskFlag.POST_MEAL_AEROBIC)
+F_ANAEROBIC = int(RiskFlag.ANAEROBIC)
+F_MISSED_METFORMIN = int(RiskFlag.MISSED_METFORMIN)
+F_MISSED_INSULIN = int(RiskFlag.MISSED_INSULIN)
+F_BMI_AMPLIFIER = int(RiskFlag.BMI_AMPLIFIER)
+F_DURATION_AMPLIFIER = int(RiskFlag.DURATION_AMPLIFIER)
+
+# Explanation entries {flag: (name, impact)}, in rule order
+EXPL_TABLE = {
+    F_HIGH_CARB:          (EXPL.HIGH_CARB, RULE.CARB_RISK),
+    F_BALANCED_MEAL:      (EXPL.BALANCED_MEAL, RULE.BALANCED_MEAL_OFFSET),
+    F_POOR_SLEEP:         (EXPL.POOR_SLEEP, RULE.SLEEP_RISK),
+    F_HIGH_STRESS:        (EXPL.HIGH_STRESS, RULE.STRESS_RISK),
+    F_LOW_ACTIVITY:       (EXPL.LOW_ACTIVITY, RULE.LOW_ACTIVITY_RISK),
+    F_POST_MEAL_AEROBIC:  (EXPL.POST_MEAL_AEROBIC, RULE.POST_MEAL_AEROBIC_OFFSET),
+    F_ANAEROBIC:          (EXPL.ANAEROBIC, RULE.ANAEROBIC_OFFSET),
+    F_MISSED_METFORMIN:   (EXPL.MISSED_METFORMIN, RULE.METFORMIN_RISK),
+    F_MISSED_INSULIN:     (EXPL.MISSED_INSULIN, RULE.INSULIN_RISK),
+    F_BMI_AMPLIFIER:      (EXPL.BMI_AMPLIFIER, RULE.BMI_AMPLIFIER),
+    F_DURATION_AMPLIFIER: (EXPL.DURATION_AMPLIFIER, RULE.DURATION_AMPLIFIER),
+}
+
+def explanation_from_flags(flags):
+    """Expands RiskFlag bits into the {factor: impact} explanation dict."""
+    return {name: impact for flag, (name, impact) in EXPL_TABLE.items() if flags & flag}
+
+# --- [ NEW ] PER-USER SPECIALIZED SCORERS ---
+# The clinical and compounding rules depend only on the user's profile, which does not
+# change between requests. So for each profile we generate a version of the rule engine
+# with those checks already decided: rules that can never fire are left out entirely.
+
+# Everything the rules (and the feedback) need from a profile
+ProfileKey = namedtuple('ProfileKey', ['on_metformin', 'on_insulin', 'high_bmi', 'long_duration'])
+
+def profile_key(user: UserProfile):
+    """Returns the ProfileKey of `user`. Profiles with the same key always get the same results."""
+    return ProfileKey(user.on_metformin, user.on_insulin,
+                      user.bmi > RULE.BMI_THRESHOLD,
+                      user.years_since_diagnosis > RULE.DURATION_THRESHOLD)
+
+# The generated source. The thresholds and weights are filled in from RULE (as
+# literals) when this module loads.
+
+# Rules that only depend on the log (the same for every user)
+_SCORER_HEAD = """\
+def _score(log):
+    score = 0.0
+    flags = 0
+    carbs = log.carbs_g
+    if carbs > {r.CARB_THRESHOLD!r}:
+        score += {r.CARB_RISK!r}
+        flags |= F_HIGH_CARB
+        if log.protein_g > {r.BALANCED_PROTEIN_THRESHOLD!r} or log.fat_g > {r.BALANCED_FAT_THRESHOLD!r}:
+            score += {r.BALANCED_MEAL_OFFSET!r}
+            flags |= F_BALANCED_MEAL
+    if log.sleep_hours < {r.SLEEP_THRESHOLD!r}:
+        score += {r.SLEEP_RISK!r}
+        flags |= F_POOR_SLEEP
+    if log.stress_level == STRESS_HIGH:
+        score += {r.STRESS_RISK!r}
+        flags |= F_HIGH_STRESS
+    if log.activity_minutes < {r.ACTIVITY_THRESHOLD!r}:
+        score += {r.LOW_ACTIVITY_RISK!r}
+        flags |= F_LOW_ACTIVITY
+    elif log.activity_type == ACTIVITY_AEROBIC and carbs > {r.POST_MEAL_CARB_THRESHOLD!r}:
+        score += {r.POST_MEAL_AEROBIC_OFFSET!r}
+        flags |= F_POST_MEAL_AEROBIC
+    elif log.activity_type == ACTIVITY_ANAEROBIC:
+        score += {r.ANAEROBIC_OFFSET!r}
+        flags |= F_ANAEROBIC
+""".format(r=RULE)
+
+# Profile-dependent rules, only added when the profile makes them possible
+_SCORER_ON_METFORMIN = """\
+    if not log.took_metformin:
+        score += {r.METFORMIN_RISK!r}
+        flags |= F_MISSED_METFORMIN
+""".format(r=RULE)
+_SCORER_ON_INSULIN = """\
+    if not log.took_insulin:
+        score += {r.INSULIN_RISK!r}
+        flags |= F_MISSED_INSULIN
+""".format(r=RULE)
+_SCORER_HIGH_BMI = """\
+    if score > 0:
+        score += {r.BMI_AMPLIFIER!r}
+        flags |= F_BMI_AMPLIFIER
+""".format(r=RULE)
+_SCORER_LONG_DURATION = """\
+    if score > 0:
+        score += {r.DURATION_AMPLIFIER!r}
+        flags |= F_DURATION_AMPLIFIER
+""".format(r=RULE)
+
+_SCORER_TAIL = """\
+    final_risk_score = max(0, score)
+    final_risk_score = min(final_risk_score, 1.0)
+    return final_risk_score, flags
+"""
+
+# There are only 16 possible specializations, so each one is compiled once and shared
+_SPECIALIZED_SCORERS = {}
+
+def _scorer_for(key: ProfileKey):
+    """
+    Returns the rule engine specialized for a profile key: a function
+    scorer(log) -> (risk_score, flags), with one RiskFlag bit per rule that fired.
+    """
+    scorer = _SPECIALIZED_SCORERS.get(key)
+    if scorer is None:
+        source = (_SCORER_HEAD
+                  + (_SCORER_ON_METFORMIN if key.on_metformin else "")
+                  + (_SCORER_ON_INSULIN if key.on_insulin else "")
+                  + (_SCORER_HIGH_BMI if key.high_bmi else "")
+                  + (_SCORER_LONG_DURATION if key.long_duration else "")
+                  + _SCORER_TAIL)
+        namespace = {
+            'F_HIGH_CARB': F_HIGH_CARB,
+            'F_BALANCED_MEAL': F_BALANCED_MEAL,
+            'F_POOR_SLEEP': F_POOR_SLEEP,
+            'F_HIGH_STRESS': F_HIGH_STRESS,
+            'F_LOW_ACTIVITY': F_LOW_ACTIVITY,
+            'F_POST_MEAL_AEROBIC': F_POST_MEAL_AEROBIC,
+            'F_ANAEROBIC': F_ANAEROBIC,
+            'F_MISSED_METFORMIN': F_MISSED_METFORMIN,
+            'F_MISSED_INSULIN': F_MISSED_INSULIN,
+            'F_BMI_AMPLIFIER': F_BMI_AMPLIFIER,
+            'F_DURATION_AMPLIFIER': F_DURATION_AMPLIFIER,
+            'STRESS_HIGH': STRESS_HIGH,
+            'ACTIVITY_AEROBIC': ACTIVITY_AEROBIC,
+            'ACTIVITY_ANAEROBIC': ACTIVITY_ANAEROBIC,
+        }
+        exec(compile(source, f"<scorer {tuple(key)}>", "exec"), namespace)
+        scorer = _SPECIALIZED_SCORERS[key] = namespace['_score']
+    return scorer
+
+def get_prediction_and_explanation(user: UserProfile, log):
+    """
+    Simulates a trained ML model by analyzing the user's profile and latest log.
+    [ --- MODIFIED --- ] A thin wrapper around the scorer specialized for the profile.
+    Returns (risk_score, explanation), with the explanation as a {factor: impact} dict.
+    """
+    risk, flags = _scorer_for(profile_key(user))(log)
+    return risk, explanation_from_flags(flags)
+
+# --- [ NEW ] LEVEL 3 ANALYSIS: PROACTIVE TARGET SETTER ---
+
+def _get_daily_targets(high_bmi: bool, log: DailyLog):
+    """
+    This new helper function generates an "ideal" quantitative plan for the user
+    based on their static profile AND their vitals (sleep, stress).
+    This allows the main feedback function to compare the user's log to an ideal plan.
+    """
+    # Start with a clinical baseline
+    targets = {
+        'carbs': 150,    # (g)
+        'protein': 100,  # (g)
+        'fat': 60,       # (g)
+        'activity': 30   # (min)
+    }
+
+    # --- Adjust targets based on user's state for the day ---
+    
+    # 1. Poor sleep = higher insulin resistance. Lower carb target.
+    if log.sleep_hours < 6:
+        targets['carbs'] -= 30  # (e.g., target is now 120g)
+        
+    # 2. High stress = cortisol spike. Lower carb target, increase activity.
+    if log.stress_level == STRESS_HIGH:
+        targets['carbs'] -= 20  # (e.g., target is now 100g)
+        targets['activity'] += 15 # (e.g., target is now 45 min)
+        
+    # 3. Higher BMI = lower carb/fat target for weight management.
+    if high_bmi:
+        targets['carbs'] -= 15   # (e.g., target is now 85g)
+        targets['fat'] -= 10     # (e.g., target is now 50g)
+
+    return targets
+
+# --- 3. PERSONALIZED FEEDBACK ENGINE (The "Smarter" Voice) ---
+
+def generate_personalized_feedback(user: UserProfile, log: DailyLog, risk_score: float, flags: int):
+    """Returns the feedback for `log`. Of the profile, only the BMI range matters."""
+    return _personalized_feedback(user.bmi > RULE.BMI_THRESHOLD, log, risk_score, flags)
+
+def _personalized_feedback(high_bmi: bool, log: DailyLog, risk_score: float, flags: int):
+    """
+    [ --- UPGRADED --- ]
+    Now includes all 3 levels of analysis:
+    1. Corrective (High-priority fixes)
+    2. Proactive (Quantitative, target-based feedback)
+    3. Positive (Reinforcement for good actions)
+    [ --- MODIFIED --- ] Takes the RiskFlag bits from the prediction engine.
+    """
+    
+    # --- Heuristic Constants for Quantitative Feedback ---
+    CARB_BASELINE = 60  # (g) Assumed "normal" carb load for a meal
+    CARB_TO_WALK_RATIO = 1.0 # (min/g) 1 minute of walking offsets 1g of excess carbs
+    
+    # This will hold our final feedback string
+    suggestion = ""
+    
+    # --- LEVEL 1: CRITICAL & HIGH-PRIORITY FEEDBACK (Overrides all else) ---
+    if flags & F_MISSED_INSULIN:
+        return ("**CRITICAL SUGGESTION:** You logged that you missed your insulin. "
+                "This is the #1 reason for your high-risk score. Please follow your doctor's "
+                "advice on what to do when you miss a dose.")
+
+    if flags & F_MISSED_METFORMIN:
+        return ("**HIGH PRIORITY SUGGESTION:** We noticed you may have missed your Metformin. "
+                "This is a key factor in your risk today. "
+                "Please try to set a reminder for your next dose.")
+
+    # --- LEVEL 2: HIGH-RISK CORRECTIVE FEEDBACK ---
+    elif risk_score > 0.6:
+        # --- Quantitative Carb Suggestion ---
+        if flags & F_HIGH_CARB and not flags & F_POST_MEAL_AEROBIC:
+            excess_carbs = log.carbs_g - CARB_BASELINE
+            activity_suggestion_minutes = int(excess_carbs * CARB_TO_WALK_RATIO)
+            
+            # Clamp the suggestion to a reasonable amount
+            activity_suggestion_minutes = max(15, min(activity_suggestion_minutes, 45)) 
+            
+            suggestion = (f"**HIGH RISK DETECTED.** Your carb load was high and un-managed by activity. "
+                    f"**Corrective Action:** To help your body process these {log.carbs_g}g of carbs, "
+                    f"a **{activity_suggestion_minutes}-minute aerobic walk** in the next hour is strongly recommended.")
+        
+        # --- Stress Suggestion ---
+        elif flags & F_HIGH_STRESS:
+            suggestion = ("**HIGH RISK DETECTED.** You noted high stress. Stress (cortisol) "
+                    "can directly raise blood sugar, even if you eat perfectly. "
+                    "**Corrective Action:** Please take 5-10 minutes for a guided breathing exercise or a quiet walk. "
+                    "Managing stress is key to managing glucose.")
+        
+        # --- Fallback for other high-risk combos ---
+        else:
+            suggestion = ("**HIGH RISK DETECTED.** Multiple factors are contributing to this risk. "
+                          "**Corrective Action:** A 15-minute walk is recommended. "
+                          "**Preventive Tip:** Please review the risk factors in the 'Why?' section and let's aim to adjust one or two tomorrow.")
+
+    # --- LEVEL 3: MODERATE & LOW-RISK (Proactive & Positive Feedback) ---
+    else:
+        # --- First, check for positive reinforcement ---
+        if flags & F_POST_MEAL_AEROBIC:
+             suggestion = ("✅ **PERFECT STRATEGY!** You logged a high-carb meal *and* the aerobic activity "
+                     "to manage it. This is exactly how to do it. Your risk score is low as a result. ")
+        
+        elif risk_score < 0.2: # All-clear!
+             suggestion = ("✅ **GREAT JOB!** Your risk score is low. "
+                "Your logs show you're balancing your meals, activity, and medication well. ")
+
+        # --- If no major corrective/positive feedback, give moderate tips ---
+        elif flags & F_HIGH_CARB and not flags & F_BALANCED_MEAL:
+            suggestion = ("**MODERATE RISK.** Your meal was high in carbs and low in protein/fat. "
+                    "**Corrective Action:** A quick 10-minute walk would be great. "
+                    "**Preventive Tip:** For your next meal, try adding a source of protein (like chicken or beans) "
+                    "to your carbs to help slow down sugar absorption.")
+        
+        elif flags & F_POOR_SLEEP:
+            suggestion = ("**MODERATE RISK.** You logged poor sleep. This can affect your "
+                    "sugar levels all day. Your body may be more sensitive to carbs today. "
+                    "**Preventive Tip:** Let's focus on planning for a good night's rest tonight.")
+        
+        # --- Default positive feedback if suggestion is still empty ---
+        if not suggestion:
+            suggestion = ("✅ **GOOD WORK!** Your risk is well-managed. ")
+
+
+    # --- [ NEW ] LEVEL 3, PART 2: APPEND QUANTITATIVE PREVENTIVE ANALYSIS ---
+    # This section adds the "have x more carbs", "do y more activity" feedback
+    # We do this *in addition* to the main suggestion, unless it was a critical error.
+    
+    if not flags & F_MISSED_INSULIN and not flags & F_MISSED_METFORMIN:
+        
+        # Get the user's "ideal" targets for today
+        targets = _get_daily_targets(high_bmi, log)
+        
+        # This list will hold our new proactive tips
+        proactive_tips = []
+        
+        # 1. Analyze Carbs
+        carb_diff = targets['carbs'] - log.carbs_g
+        if carb_diff < -15: # User went more than 15g OVER target
+            proactive_tips.append(f"Your carb log of {log.carbs_g}g was **{abs(carb_diff)}g over** your personalized target of {targets['carbs']}g for today.")
+        
+        # 2. Analyze Protein
+        protein_diff = targets['protein'] - log.protein_g
+        if protein_diff > 15: # User went more than 15g UNDER target
+            proactive_tips.append(f"You were **{protein_diff}g under** your protein target of {targets['protein']}g. Adding more protein can help with balance.")
+            
+        # 3. Analyze Fat
+        fat_diff = targets['fat'] - log.fat_g
+        if fat_diff > 10: # User went more than 10g UNDER target
+            proactive_tips.append(f"You were {fat_diff}g under your healthy fat target. Don't be afraid to add healthy fats like avocado or nuts.")
+
+        # 4. Analyze Activity
+        activity_diff = targets['activity'] - log.activity_minutes
+        if activity_diff > 10: # User was more than 10 min UNDER target
+            proactive_tips.append(f"You were **{activity_diff} minutes short** of your activity target of {targets['activity']} minutes. Let's try to close that gap tomorrow!")
+            
+        # --- Now, append these tips to the main suggestion ---
+        if proactive_tips:
+            # Add a header for the new section
+            suggestion += "\n\n**--- Proactive Plan for Tomorrow ---**\n"
+            # Add each tip as a bullet point
+            for tip in proactive_tips:
+                suggestion += f"\n• {tip}"
+        elif risk_score < 0.2:
+            # If they hit all their targets
+            suggestion += "You also hit your personalized macro and activity targets for the day. Fantastic!"
+
+    return suggestion
+
+
+# --- [ NEW ] FORECAST CACHE ---
+# Scoring and feedback are pure functions of the profile key and the log values,
+# so a repeated request (re-opening the app, replaying an offline queue, a "what-if"
+# slider going back and forth) can reuse the earlier result.
+
+@functools.lru_cache(maxsize=8192)
+def _cached_forecast(key, log):
+    (risk, flags) = _scorer_for(key)(log)
+    suggestion = _personalized_feedback(key.high_bmi, log, risk, flags)
+    return risk, flags, suggestion
+
+def forecast(user: UserProfile, log):
+    """
+    Returns (risk_score, flags, suggestion) for a NormLog.
+    The cache key is the user's ProfileKey, not the profile itself: entries don't
+    keep old profiles (and their logs) alive, the key follows any change to the
+    profile, and users with the same key share entries.
+    """
+    return _cached_forecast(profile_key(user), log)
@@ -0,0 +1,193 @@
+import datetime
+import msgspec
+import orjson
+from flask import Blueprint, request
+
+from .api import (
+    ERR_INTERNAL, ERR_USER_NAME_REQUIRED, ERR_USER_NOT_FOUND, LogFields, decode_body, fastjson,
+)
+from .db import get_user, shard_lock
+from .models import AMOUNT_MAX, AMOUNT_MIN, DailyLog, amounts_in_range, normalize_log
+from .rules import explanation_from_flags, forecast, generate_personalized_feedback
+
+scoring_bp = Blueprint('scoring', __name__)
+
+# --- [ NEW ] Lazy engine import ---
+# The batch engine (predict_batch) is only used by /add_logs. Instead of every
+# Gunicorn worker loading it at startup, a worker loads it when it serves its first
+# /add_logs request, so workers that never get one don't pay for it.
+
+_engine_loaded = False
+predict_batch = None  # engine.predict_batch, once loaded
+
+def _lazy_import():
+    """Loads the NumPy engine on the first call (once per worker process)."""
+    global _engine_loaded, predict_batch
+    if _engine_loaded:
+        return
+    from . import engine
+    predict_batch = engine.predict_batch
+    _engine_loaded = True
+
+# Upper bound on the number of logs accepted by one /add_logs request
+MAX_BATCH_LOGS = 1000
+
+class LogIn(LogFields):
+    """The body of a /add_log request."""
+    user_name: str = ""
+
+class LogsIn(msgspec.Struct):
+    """The body of a /add_logs request."""
+    logs: list[LogFields]
+    user_name: str = ""
+
+_LOG_IN_DECODER = msgspec.json.Decoder(LogIn)
+_LOGS_IN_DECODER = msgspec.json.Decoder(LogsIn)
+
+_ERR_LOGS_REQUIRED = orjson.dumps({"error": "Missing field: logs must be a list"})
+_ERR_LOG_NOT_OBJECT = orjson.dumps({"error": "Invalid field: every entry of logs must be an object"})
+_ERR_TOO_MANY_LOGS = orjson.dumps({"error": f"Too many logs: send at most {MAX_BATCH_LOGS} per request"})
+_ERR_OUT_OF_RANGE = orjson.dumps(
+    {"error": f"Out of range: grams and minutes must be between {AMOUNT_MIN} and {AMOUNT_MAX}"})
+
+@scoring_bp.route('/add_log', methods=['POST'])
+def add_log_and_predict():
+    """
+    Endpoint to add a daily log and get a prediction.
+    [ --- MODIFIED --- ] Now accepts all new fields and is robust.
+    """
+    body = decode_body(_LOG_IN_DECODER)
+    data = request.json if body is None else None
+    
+    try:
+        # 1. Read the log (fast path for well-typed bodies, safe .get() otherwise)
+        if body is not None:
+            user_name = body.user_name
+            log = body.to_log()
+        else:
+            user_name = data.get('user_name')
+            log = normalize_log(
+                data.get('sleep_hours'),
+                data.get('sleep_quality'),
+                data.get('carbs_g'),
+                data.get('protein_g'),
+                data.get('fat_g'),
+                data.get('activity_minutes'),
+                data.get('activity_type'),
+                data.get('stress_level'),
+                data.get('took_metformin'),
+                data.get('took_insulin'),
+            )
+
+        # 2. Find the user
+        if not user_name:
+             return fastjson(ERR_USER_NAME_REQUIRED, 400)
+        if not amounts_in_range(log):
+            return fastjson(_ERR_OUT_OF_RANGE, 400)
+        current_user = get_user(user_name)
+        if current_user is None:
+            return fastjson(ERR_USER_NOT_FOUND, 404)
+        
+        # 3. Save the log in the user's column store
+        with shard_lock(user_name):
+            current_user.store.append_normalized(datetime.date.today(), log)
+        
+        # 4. Run the AI Engine and generate feedback
+        #    (cached; computed with the scorer specialized for this user's profile)
+        (risk, flags, suggestion) = forecast(current_user, log)
+        
+        # 5. Send the complete result back to Lovable
+        return fastjson({
+            "risk_score": risk,
+            "risk_percentage": f"{risk*100:.0f}%",
+            "explanation": explanation_from_flags(flags),
+            "suggestion": suggestion
+        }, 200)
+
+    except Exception as e:
+        # Log the full error on the server for debugging
+        print(f"Error in /add_log: {str(e)}")
+        # Return a generic error to the user
+        return fastjson(ERR_INTERNAL, 500)
+
+@scoring_bp.route('/add_logs', methods=['POST'])
+def add_logs_and_predict():
+    """
+    [ NEW ] Endpoint to add many daily logs at once (e.g. a week synced from an
+    offline device) and get a prediction for each, in one request.
+    Body: {"user_name": ..., "logs": [{...}, {...}]} where each log has the same
+    fields as /add_log. All logs are scored together by predict_batch.
+    """
+    _lazy_import()
+    body = decode_body(_LOGS_IN_DECODER)
+    data = request.json if body is None else None
+
+    try:
+        # 1. Read the logs (fast path for well-typed bodies, safe .get() otherwise)
+        if body is not None:
+            user_name = body.user_name
+            raw_logs = body.logs
+        else:
+            user_name = data.get('user_name')
+            raw_logs = data.get('logs')
+
+        if not user_name:
+            return fastjson(ERR_USER_NAME_REQUIRED, 400)
+        if not isinstance(raw_logs, list):
+            return fastjson(_ERR_LOGS_REQUIRED, 400)
+        if body is None and not all(isinstance(entry, dict) for entry in raw_logs):
+            return fastjson(_ERR_LOG_NOT_OBJECT, 400)
+        if len(raw_logs) > MAX_BATCH_LOGS:
+            return fastjson(_ERR_TOO_MANY_LOGS, 400)
+
+        if body is not None:
+            logs = [entry.to_log() for entry in raw_logs]
+        else:
+            logs = [
+                normalize_log(
+                    entry.get('sleep_hours'),
+                    entry.get('sleep_quality'),
+                    entry.get('carbs_g'),
+                    entry.get('protein_g'),
+                    entry.get('fat_g'),
+                    entry.get('activity_minutes'),
+                    entry.get('activity_type'),
+                    entry.get('stress_level'),
+                    entry.get('took_metformin'),
+                    entry.get('took_insulin'),
+                )
+                for entry in raw_logs
+            ]
+        if not all(map(amounts_in_range, logs)):
+            return fastjson(_ERR_OUT_OF_RANGE, 400)
+
+        # 2. Find the user
+        current_user = get_user(user_name)
+        if current_user is None:
+            return fastjson(ERR_USER_NOT_FOUND, 404)
+
+        # 3. Convert to columns once, then save them all in one go
+        cols = DailyLog.to_arrays(logs)
+        with shard_lock(user_name):
+            current_user.store.append_many(datetime.date.today(), cols)
+
+        # 4. Run the AI Engine on the whole batch in one NumPy pass
+        risks, flags = predict_batch(current_user, cols)
+
+        # 5. Build the per-log results (feedback is still per log)
+        results = []
+        for log, risk, log_flags in zip(logs, risks.tolist(), flags.tolist()):
+            results.append({
+                "risk_score": risk,
+                "risk_percentage": f"{risk*100:.0f}%",
+                "explanation": explanation_from_flags(log_flags),
+                "suggestion": generate_personalized_feedback(current_user, log, risk, log_flags)
+            })
+
+        return fastjson({"results": results}, 200)
+
+    except Exception as e:
+        # Log the full error on the server for debugging
+        print(f"Error in /add_logs: {str(e)}")
+        # Return a generic error to the user
+        return fastjson(ERR_INTERNAL, 500)
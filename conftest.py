@@ -0,0 +1 @@
+# Lets the tests import `app` and `glucoflow_engine` from the repository root.
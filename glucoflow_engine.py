@@ -0,0 +1,450 @@
+# Data classes, rule engine, batch scoring and feedback for glucoflow.py.
+# Streamlit re-executes the script on every full rerun, which rebuilds everything it
+# defines: caches start empty, and each rerun makes new classes, so a profile kept in
+# st.session_state is no longer an instance of the script's UserProfile. An imported
+# module is loaded once per process and kept in sys.modules, so these live here.
+import bisect
+import collections
+import datetime
+import functools
+import sys
+from dataclasses import dataclass, field
+from typing import Final
+import numpy as np
+
+# Rule Constants
+# The thresholds and weights of the rule engine, shared by the Python rules (_RULES)
+# and the Numba kernel (_score_batch), which compiles them in as constants
+CARB_THRESHOLD: Final = 80  # g
+CARB_RISK: Final = 0.40
+BALANCED_PROTEIN_THRESHOLD: Final = 15  # g
+BALANCED_FAT_THRESHOLD: Final = 10  # g
+BALANCED_MEAL_OFFSET: Final = -0.10
+SLEEP_THRESHOLD: Final = 6  # hours
+SLEEP_RISK: Final = 0.15
+STRESS_RISK: Final = 0.20
+ACTIVITY_THRESHOLD: Final = 10  # minutes
+LOW_ACTIVITY_RISK: Final = 0.15
+POST_MEAL_CARB_THRESHOLD: Final = 50  # g
+POST_MEAL_AEROBIC_OFFSET: Final = -0.20
+ANAEROBIC_OFFSET: Final = -0.10
+METFORMIN_RISK: Final = 0.30
+INSULIN_RISK: Final = 0.50
+BMI_THRESHOLD: Final = 28
+BMI_AMPLIFIER: Final = 0.10
+DURATION_THRESHOLD: Final = 5  # years
+DURATION_AMPLIFIER: Final = 0.10
+
+# Risk levels used by the feedback and the result display
+MODERATE_RISK: Final = 0.4
+STRESS_ALERT_RISK: Final = 0.6
+HIGH_RISK: Final = 0.7
+
+# Category codes: the selectbox text ("High", "Aerobic", ...) is stored as a small int.
+# Matching is case-insensitive and unknown values get code 0.
+STRESS_CODES = {"low": 0, "medium": 1, "high": 2}
+ACTIVITY_CODES = {"none": 0, "aerobic": 1, "anaerobic": 2}
+
+STRESS_HIGH = STRESS_CODES["high"]
+ACTIVITY_AEROBIC = ACTIVITY_CODES["aerobic"]
+ACTIVITY_ANAEROBIC = ACTIVITY_CODES["anaerobic"]
+
+# Helper Functions
+_TRUTHY = frozenset(('true', 't', '1', 'yes', 'y'))
+
+def safe_int(value, default=0):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        pass
+    try:
+        return int(float(value))  # e.g. "80.5"
+    except (ValueError, TypeError):
+        return default
+
+def safe_float(value, default=0.0):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+def safe_bool(value):
+    # Fast paths: checkboxes return a bool, and numbers don't need a string round-trip
+    if value is True or value is False:
+        return value
+    if value is None:
+        return False
+    if isinstance(value, (int, float)):
+        return bool(value)
+    return value.lower() in _TRUTHY if isinstance(value, str) else False
+
+def _coerce(value, conv, default):
+    # Slow path for values that aren't already of type `conv`
+    if type(conv) is dict:  # category codes
+        return conv.get(str(value).lower(), default)
+    if conv is int:
+        return safe_int(value, default)
+    if conv is float:
+        return safe_float(value, default)
+    if conv is bool:
+        return safe_bool(value)
+    return conv(value)
+
+# (attribute, type, default) for each form field.
+# Values that already have the right type (what Streamlit widgets return) are stored as-is.
+# A dict "type" maps the text to its category code.
+_USER_SCHEMA = (
+    ("name", str, None),
+    ("age", int, 30),
+    ("diagnosis_type", str, None),
+    ("years_since_diagnosis", int, 0),
+    ("bmi", float, 25.0),
+    ("on_metformin", bool, False),
+    ("on_insulin", bool, False),
+)
+
+_LOG_SCHEMA = (
+    ("sleep_hours", float, 0),
+    ("sleep_quality", str, None),
+    ("carbs_g", int, 0),
+    ("protein_g", int, 0),
+    ("fat_g", int, 0),
+    ("activity_minutes", int, 0),
+    ("activity_type", ACTIVITY_CODES, 0),
+    ("stress_level", STRESS_CODES, 0),
+    ("took_metformin", bool, False),
+    ("took_insulin", bool, False),
+)
+
+def _coerce_fields(schema, raw):
+    fields = {}
+    for attr, conv, default in schema:
+        v = raw[attr]
+        fields[attr] = v if type(v) is conv else _coerce(v, conv, default)
+    return fields
+
+# Data Classes
+class _LogBuffer:
+    # A user's log history, stored column-wise (one NumPy array per field) and growing by
+    # doubling like a list. Grams and minutes fit in int16 (the form caps them at 1440).
+    _COLUMNS = (
+        ("date", "datetime64[D]"),
+        ("sleep_hours", np.float64),
+        ("sleep_quality", object),
+        ("carbs_g", np.int16),
+        ("protein_g", np.int16),
+        ("fat_g", np.int16),
+        ("activity_minutes", np.int16),
+        ("activity_type", np.int8),
+        ("stress_level", np.int8),
+        ("took_metformin", np.bool_),
+        ("took_insulin", np.bool_),
+    )
+
+    def __init__(self, capacity=16):
+        self._n = 0
+        self._data = {name: np.empty(capacity, dtype=dtype) for name, dtype in self._COLUMNS}
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("log index out of range")
+        return DailyLog(*(self._data[name].item(i) for name, _ in self._COLUMNS))
+
+    def __iter__(self):
+        return (self[i] for i in range(self._n))
+
+    def append(self, log):
+        if self._n == len(self._data["date"]):
+            for name, column in self._data.items():
+                self._data[name] = np.resize(column, 2 * len(column))
+        for name, column in self._data.items():
+            column[self._n] = getattr(log, name)
+        self._n += 1
+
+    def column(self, name):
+        # The filled part of a column (a view, not a copy)
+        return self._data[name][:self._n]
+
+@dataclass(slots=True, frozen=True)
+class UserProfile:
+    name: str
+    age: int
+    diagnosis_type: str
+    years_since_diagnosis: int
+    bmi: float
+    on_metformin: bool
+    on_insulin: bool
+    logs: _LogBuffer = field(default_factory=_LogBuffer, compare=False, repr=False)
+
+    @classmethod
+    def from_form(cls, **raw):
+        return cls(**_coerce_fields(_USER_SCHEMA, raw))
+
+@dataclass(slots=True, frozen=True)
+class DailyLog:
+    date: datetime.date
+    sleep_hours: float
+    sleep_quality: str
+    carbs_g: int
+    protein_g: int
+    fat_g: int
+    activity_minutes: int
+    activity_type: int
+    stress_level: int
+    took_metformin: bool
+    took_insulin: bool
+
+    @classmethod
+    def from_form(cls, date, **raw):
+        return cls(date=date, **_coerce_fields(_LOG_SCHEMA, raw))
+
+# AI Engine
+# The fields the rules read. Being a tuple, it is also the cache key for _score_core.
+_ScoreInputs = collections.namedtuple("_ScoreInputs", (
+    "bmi", "years_since_diagnosis", "on_metformin", "on_insulin",
+    "carbs_g", "protein_g", "fat_g", "sleep_hours", "stress_level",
+    "activity_minutes", "activity_type", "took_metformin", "took_insulin",
+))
+
+# One bit per rule: the engine returns the rules that fired as a single int mask
+RULE_HIGH_CARB = 1 << 0
+RULE_BALANCED_MEAL = 1 << 1
+RULE_POOR_SLEEP = 1 << 2
+RULE_HIGH_STRESS = 1 << 3
+RULE_LOW_ACTIVITY = 1 << 4
+RULE_POST_MEAL_AEROBIC = 1 << 5
+RULE_ANAEROBIC = 1 << 6
+RULE_METFORMIN_MISSED = 1 << 7
+RULE_INSULIN_MISSED = 1 << 8
+RULE_BMI_AMPLIFIER = 1 << 9
+RULE_DURATION_AMPLIFIER = 1 << 10
+
+# Explanation keys, interned so every explanation dict shares one key object per rule
+_K_HIGH_CARB = sys.intern("High-Carb Meal ( > 80g)")
+_K_BALANCED_MEAL = sys.intern("Balanced Meal Offset")
+_K_POOR_SLEEP = sys.intern("Poor Sleep ( < 6 hours)")
+_K_HIGH_STRESS = sys.intern("High Stress Level")
+_K_LOW_ACTIVITY = sys.intern("Low Activity ( < 10 min)")
+_K_POST_MEAL_AEROBIC = sys.intern("Post-Meal Aerobic Activity")
+_K_ANAEROBIC = sys.intern("Anaerobic Activity")
+_K_METFORMIN = sys.intern("Missed Metformin Dose")
+_K_INSULIN = sys.intern("Missed Insulin Dose")
+_K_BMI = sys.intern("Risk amplified by BMI")
+_K_DURATION = sys.intern("Risk amplified by T2D duration")
+
+# (bit, factor, impact, applies) in the order they are added to the score
+_RULES = (
+    # 1. Dietary Factors
+    (RULE_HIGH_CARB, _K_HIGH_CARB, CARB_RISK, lambda x: x.carbs_g > CARB_THRESHOLD),
+    (RULE_BALANCED_MEAL, _K_BALANCED_MEAL, BALANCED_MEAL_OFFSET,
+     lambda x: x.carbs_g > CARB_THRESHOLD
+     and (x.protein_g > BALANCED_PROTEIN_THRESHOLD or x.fat_g > BALANCED_FAT_THRESHOLD)),
+    # 2. Lifestyle Factors
+    (RULE_POOR_SLEEP, _K_POOR_SLEEP, SLEEP_RISK, lambda x: x.sleep_hours < SLEEP_THRESHOLD),
+    (RULE_HIGH_STRESS, _K_HIGH_STRESS, STRESS_RISK, lambda x: x.stress_level == STRESS_HIGH),
+    # The three activity rules are mutually exclusive
+    (RULE_LOW_ACTIVITY, _K_LOW_ACTIVITY, LOW_ACTIVITY_RISK,
+     lambda x: x.activity_minutes < ACTIVITY_THRESHOLD),
+    (RULE_POST_MEAL_AEROBIC, _K_POST_MEAL_AEROBIC, POST_MEAL_AEROBIC_OFFSET,
+     lambda x: x.activity_minutes >= ACTIVITY_THRESHOLD and x.activity_type == ACTIVITY_AEROBIC
+     and x.carbs_g > POST_MEAL_CARB_THRESHOLD),
+    (RULE_ANAEROBIC, _K_ANAEROBIC, ANAEROBIC_OFFSET,
+     lambda x: x.activity_minutes >= ACTIVITY_THRESHOLD and x.activity_type == ACTIVITY_ANAEROBIC),
+    # 3. Clinical Factors
+    (RULE_METFORMIN_MISSED, _K_METFORMIN, METFORMIN_RISK,
+     lambda x: x.on_metformin and not x.took_metformin),
+    (RULE_INSULIN_MISSED, _K_INSULIN, INSULIN_RISK,
+     lambda x: x.on_insulin and not x.took_insulin),
+)
+
+# 4. Compounding Factors: only applied while the score so far is positive
+_AMPLIFIERS = (
+    (RULE_BMI_AMPLIFIER, _K_BMI, BMI_AMPLIFIER, lambda x: x.bmi > BMI_THRESHOLD),
+    (RULE_DURATION_AMPLIFIER, _K_DURATION, DURATION_AMPLIFIER,
+     lambda x: x.years_since_diagnosis > DURATION_THRESHOLD),
+)
+
+# {bit: (factor, impact)} in rule order, to turn a mask back into an explanation
+_RULE_INFO = {bit: (factor, impact) for bit, factor, impact, _ in _RULES + _AMPLIFIERS}
+
+def explanation_from_mask(mask: int) -> dict:
+    return {factor: impact for bit, (factor, impact) in _RULE_INFO.items() if mask & bit}
+
+@functools.lru_cache(maxsize=256)
+def _score_core(x: _ScoreInputs):
+    # Returns (risk_score, mask). Every rule contributes impact * fired, i.e. 0.0 when it
+    # doesn't fire, to one running sum in rule order. Adding the 0.0 terms is exact, so this
+    # matches adding only the rules that fired; fsum/sum() can round differently, which moves
+    # scores that sit exactly on a feedback threshold (e.g. 0.6 vs 0.6000000000000001)
+    risk_score = 0.0
+    mask = 0
+    for bit, _, impact, applies in _RULES:
+        fired = applies(x)
+        risk_score += impact * fired
+        mask |= bit * fired
+
+    # Nothing to amplify: the final clamp would give 0 anyway
+    if risk_score <= 0:
+        return 0, mask
+
+    # Amplifiers only add, so the score stays positive for both of them
+    for bit, _, impact, applies in _AMPLIFIERS:
+        if applies(x):
+            risk_score += impact
+            mask |= bit
+
+    # 5. Finalize Score
+    final_risk_score = max(0, min(risk_score, 1.0))
+    return final_risk_score, mask
+
+def score_inputs(user, log) -> _ScoreInputs:
+    return _ScoreInputs(
+        user.bmi, user.years_since_diagnosis, user.on_metformin, user.on_insulin,
+        log.carbs_g, log.protein_g, log.fat_g, log.sleep_hours, log.stress_level,
+        log.activity_minutes, log.activity_type, log.took_metformin, log.took_insulin,
+    )
+
+def get_prediction(user, log):
+    # Returns (risk_score, mask), with the RULE_* bit of every rule that fired
+    return _score_core(score_inputs(user, log))
+
+def get_prediction_and_explanation(user, log):
+    risk_score, mask = get_prediction(user, log)
+    return risk_score, explanation_from_mask(mask)
+
+# Batch scoring of a log history (e.g. a risk trend), one NumPy column per field.
+# Compiled with Numba when it is installed; small batches still use the Python path
+# since they would spend more time in the first call's JIT compile than in scoring.
+# Numba takes a while to import, so it is only loaded for the first large batch.
+NUMBA_MIN_LOGS = 64
+
+prange = range  # numba.prange once Numba is loaded (see load_score_batch)
+
+def _score_batch(carbs, protein, fat, sleep, stress, activity, activity_type,
+                 took_metformin, took_insulin, on_metformin, on_insulin, bmi, years):
+    # Same rules, in the same order, as _RULES and _AMPLIFIERS
+    n = len(carbs)
+    risk = np.zeros(n)
+    for i in prange(n):
+        score = 0.0
+        if carbs[i] > CARB_THRESHOLD:
+            score += CARB_RISK
+            if protein[i] > BALANCED_PROTEIN_THRESHOLD or fat[i] > BALANCED_FAT_THRESHOLD:
+                score += BALANCED_MEAL_OFFSET
+        if sleep[i] < SLEEP_THRESHOLD:
+            score += SLEEP_RISK
+        if stress[i] == STRESS_HIGH:
+            score += STRESS_RISK
+        if activity[i] < ACTIVITY_THRESHOLD:
+            score += LOW_ACTIVITY_RISK
+        elif activity_type[i] == ACTIVITY_AEROBIC and carbs[i] > POST_MEAL_CARB_THRESHOLD:
+            score += POST_MEAL_AEROBIC_OFFSET
+        elif activity_type[i] == ACTIVITY_ANAEROBIC:
+            score += ANAEROBIC_OFFSET
+        if on_metformin and not took_metformin[i]:
+            score += METFORMIN_RISK
+        if on_insulin and not took_insulin[i]:
+            score += INSULIN_RISK
+        if score > 0:
+            if bmi > BMI_THRESHOLD:
+                score += BMI_AMPLIFIER
+            if years > DURATION_THRESHOLD:
+                score += DURATION_AMPLIFIER
+        risk[i] = max(0.0, min(score, 1.0))
+    return risk
+
+@functools.cache
+def load_score_batch():
+    # The compiled _score_batch, or None without Numba. Built once per process
+    global prange
+    try:
+        import numba
+    except ImportError:
+        return None
+    prange = numba.prange
+    return numba.njit(cache=True, parallel=True)(_score_batch)
+
+def score_history(user: UserProfile, logs) -> np.ndarray:
+    # `logs` is a user's _LogBuffer or a list of DailyLog
+    score_batch = load_score_batch() if len(logs) >= NUMBA_MIN_LOGS else None
+    if score_batch is None:
+        return np.array([get_prediction(user, log)[0] for log in logs], dtype=np.float64)
+    if not isinstance(logs, _LogBuffer):
+        buffer = _LogBuffer(len(logs))
+        for log in logs:
+            buffer.append(log)
+        logs = buffer
+    col = logs.column
+    return score_batch(
+        col("carbs_g"), col("protein_g"), col("fat_g"), col("sleep_hours"), col("stress_level"),
+        col("activity_minutes"), col("activity_type"), col("took_metformin"), col("took_insulin"),
+        user.on_metformin, user.on_insulin, user.bmi, user.years_since_diagnosis,
+    )
+
+# Feedback messages
+_CRITICAL_MSG = ("CRITICAL: You logged that you missed your insulin. "
+                 "Please follow your doctor's advice on what to do "
+                 "when you miss a dose. This is the #1 reason for your high-risk score.")
+_METFORMIN_MSG = ("HIGH PRIORITY: We noticed you may have missed your Metformin. "
+                  "This is a key factor in your risk today. "
+                  "Try to set a reminder for your next dose.")
+_STRESS_MSG = ("Your risk score is high, and you noted high stress. Stress (cortisol) "
+               "can directly raise blood sugar. "
+               "**Actionable Suggestion:** Can you take 5 minutes for a guided breathing exercise?")
+_WALK_MSG = ("This is a high-risk combination... "
+             "**Actionable Suggestion:** Can you take a 15-20 minute aerobic walk? "
+             "This is the best way to help your body manage the carbs.")
+_SLEEP_HIGH_MSG = ("Your risk is high. Poor sleep can make you more insulin resistant... "
+                   "**Actionable Suggestion:** Be mindful of your next meal, "
+                   "and let's focus on getting more rest tonight.")
+_UNBALANCED_MSG = ("MODERATE RISK: Your meal was high in carbs and low in protein/fat. "
+                   "**Pro-Tip:** Adding protein or healthy fats "
+                   "to your carbs helps slow down sugar absorption. Try it for your next meal!")
+_HIGH_CARB_MSG = ("MODERATE RISK: Your meal was high in carbs. You did a good job balancing it... "
+                  "but a quick 10-minute walk would still be a great way to help.")
+_SLEEP_MSG = ("MODERATE RISK: You logged poor sleep. This can affect your "
+              "sugar levels all day. Your body may be more sensitive to carbs today.")
+_MINDFUL_MSG = "Please be mindful of your logged items, as they are contributing to a higher risk."
+_FANTASTIC_MSG = ("✅ FANTASTIC WORK! You logged a high-carb meal *and* the aerobic activity "
+                  "to manage it. This is the perfect strategy! Your risk score is low as a result.")
+_GREAT_MSG = ("✅ GREAT JOB! Your risk score is low. "
+              "Keep up the fantastic work!")
+
+# The feedback only depends on which of these thresholds the risk score is above (all
+# checks are "risk > t"), so the score is reduced to a bucket: the number of thresholds below it
+_RISK_THRESHOLDS = (MODERATE_RISK, STRESS_ALERT_RISK, HIGH_RISK)
+_ABOVE_04, _ABOVE_06, _ABOVE_07 = 1, 2, 3
+
+# (required bits, forbidden bits, minimum bucket, message) in priority order: the first
+# entry whose required rules all fired, forbidden rules didn't, and bucket is high enough wins
+_FEEDBACK_RULES = (
+    (RULE_INSULIN_MISSED, 0, 0, _CRITICAL_MSG),
+    (RULE_METFORMIN_MISSED, 0, 0, _METFORMIN_MSG),
+    (RULE_HIGH_STRESS, 0, _ABOVE_06, _STRESS_MSG),
+    # High risk
+    (RULE_HIGH_CARB | RULE_LOW_ACTIVITY, 0, _ABOVE_07, _WALK_MSG),
+    (RULE_HIGH_CARB | RULE_POOR_SLEEP, 0, _ABOVE_07, _SLEEP_HIGH_MSG),
+    (0, 0, _ABOVE_07, _MINDFUL_MSG),
+    # Moderate risk
+    (RULE_HIGH_CARB, RULE_BALANCED_MEAL, _ABOVE_04, _UNBALANCED_MSG),
+    (RULE_HIGH_CARB, 0, _ABOVE_04, _HIGH_CARB_MSG),
+    (RULE_POOR_SLEEP, 0, _ABOVE_04, _SLEEP_MSG),
+    (0, 0, _ABOVE_04, _MINDFUL_MSG),
+    # Low risk
+    (RULE_POST_MEAL_AEROBIC, 0, 0, _FANTASTIC_MSG),
+    (0, 0, 0, _GREAT_MSG),
+)
+
+@functools.lru_cache(maxsize=128)
+def _feedback_for(mask: int, bucket: int) -> str:
+    for required, forbidden, min_bucket, message in _FEEDBACK_RULES:
+        if mask & required == required and not mask & forbidden and bucket >= min_bucket:
+            return message
+
+def generate_personalized_feedback(user, log, risk_score: float, mask: int):
+    return _feedback_for(mask, bisect.bisect_left(_RISK_THRESHOLDS, risk_score))
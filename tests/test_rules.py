@@ -0,0 +1,123 @@
+"""
+The Flask rule engines (the generated per-profile scorers and predict_batch)
+against a frozen copy of the original engine, over every combination of inputs
+on either side of the rule thresholds.
+"""
+import itertools
+
+import pytest
+
+from app.engine import predict_batch
+from app.models import DailyLog, NormLog, UserProfile, normalize_log
+from app.rules import explanation_from_flags, forecast, get_prediction_and_explanation
+
+def reference_prediction(user, log):
+    """get_prediction_and_explanation as it was in app.py before the engine was rewritten."""
+    risk_score = 0.0
+    explanation = {}
+
+    carb_risk = 0.0
+    if log.carbs_g > 80:
+        carb_risk = 0.40
+        risk_score += carb_risk
+        explanation["High-Carb Meal ( > 80g)"] = carb_risk
+
+    is_balanced_meal = log.protein_g > 15 or log.fat_g > 10
+    if carb_risk > 0 and is_balanced_meal:
+        balance_offset = -0.10
+        risk_score += balance_offset
+        explanation["Balanced Meal Offset"] = balance_offset
+
+    if log.sleep_hours < 6:
+        sleep_risk = 0.15
+        risk_score += sleep_risk
+        explanation["Poor Sleep ( < 6 hours)"] = sleep_risk
+
+    if log.stress_level == "high":
+        stress_risk = 0.20
+        risk_score += stress_risk
+        explanation["High Stress Level"] = stress_risk
+
+    if log.activity_minutes < 10:
+        if "Post-Meal Aerobic Activity" not in explanation:
+            activity_risk = 0.15
+            risk_score += activity_risk
+            explanation["Low Activity ( < 10 min)"] = activity_risk
+    elif log.activity_type == "aerobic" and log.carbs_g > 50:
+        activity_offset = -0.20
+        risk_score += activity_offset
+        explanation["Post-Meal Aerobic Activity"] = activity_offset
+    elif log.activity_type == "anaerobic":
+        activity_offset = -0.10
+        risk_score += activity_offset
+        explanation["Anaerobic Activity"] = activity_offset
+
+    if user.on_metformin and not log.took_metformin:
+        metformin_risk = 0.30
+        risk_score += metformin_risk
+        explanation["Missed Metformin Dose"] = metformin_risk
+
+    if user.on_insulin and not log.took_insulin:
+        insulin_risk = 0.50
+        risk_score += insulin_risk
+        explanation["Missed Insulin Dose"] = insulin_risk
+
+    if user.bmi > 28 and risk_score > 0:
+        bmi_amplifier = 0.10
+        risk_score += bmi_amplifier
+        explanation["Risk amplified by BMI"] = bmi_amplifier
+
+    if user.years_since_diagnosis > 5 and risk_score > 0:
+        duration_amplifier = 0.10
+        risk_score += duration_amplifier
+        explanation["Risk amplified by T2D duration"] = duration_amplifier
+
+    final_risk_score = max(0, risk_score)
+    final_risk_score = min(final_risk_score, 1.0)
+    return final_risk_score, explanation
+
+# (on_metformin, on_insulin, bmi, years_since_diagnosis): all 16 specializations
+PROFILES = list(itertools.product((False, True), (False, True), (28, 28.1), (5, 6)))
+
+# Raw log inputs in NormLog field order, on either side of every threshold
+LOGS = list(itertools.product(
+    (5.9, 6),                          # sleep_hours
+    ("good",),                         # sleep_quality
+    (50, 51, 80, 81),                  # carbs_g
+    (15, 16),                          # protein_g
+    (10, 11),                          # fat_g
+    (9, 10),                           # activity_minutes
+    ("none", "aerobic", "anaerobic"),  # activity_type
+    ("low", "medium", "high"),         # stress_level
+    (False, True),                     # took_metformin
+    (False, True),                     # took_insulin
+))
+
+def make_user(on_metformin, on_insulin, bmi, years):
+    return UserProfile("test", 30, "Type 2", years, bmi, on_metformin, on_insulin)
+
+def expected(user):
+    # The original engine compared the raw (lowercase) text, not category codes
+    return [reference_prediction(user, NormLog(*raw)) for raw in LOGS]
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_get_prediction_and_explanation_matches_reference(profile):
+    user = make_user(*profile)
+    got = [get_prediction_and_explanation(user, DailyLog(None, *raw)) for raw in LOGS]
+    assert got == expected(user)
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_forecast_matches_reference(profile):
+    user = make_user(*profile)
+    got = []
+    for raw in LOGS:
+        risk, flags, _ = forecast(user, normalize_log(*raw))
+        got.append((risk, explanation_from_flags(flags)))
+    assert got == expected(user)
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_predict_batch_matches_reference(profile):
+    user = make_user(*profile)
+    risks, flags = predict_batch(user, [DailyLog(None, *raw) for raw in LOGS])
+    got = [(risk, explanation_from_flags(f)) for risk, f in zip(risks.tolist(), flags.tolist())]
+    assert got == expected(user)